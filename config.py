@@ -3,10 +3,17 @@ Configuration Management - Simplified
 Loads and validates environment variables for RunPod serverless
 """
 
-from pydantic_settings import BaseSettings
-from pydantic import Field, field_validator
-from typing import List
-import os
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field, PrivateAttr, field_validator
+from functools import lru_cache
+from typing import Any, FrozenSet, Iterable, Tuple, Union
+
+
+def _csv(value: Union[str, Iterable[str]]) -> Tuple[str, ...]:
+    """Split a comma-separated setting into a tuple of non-empty, stripped items"""
+    if not isinstance(value, str):
+        return tuple(value)
+    return tuple(item for item in (part.strip() for part in value.split(',')) if item)
 
 
 class Settings(BaseSettings):
@@ -28,7 +35,7 @@ class Settings(BaseSettings):
 
     # Video Generation Defaults
     DEFAULT_WIDTH: int = Field(default=1280, ge=256, le=1920)
-    DEFAULT_HEIGHT: int = Field(default=720, ge=256, le=1080)
+    DEFAULT_HEIGHT: int = Field(default=704, ge=256, le=1080)
     DEFAULT_NUM_FRAMES: int = Field(default=121, ge=25, le=257)
     DEFAULT_NUM_STEPS: int = Field(default=8, ge=1, le=50)
     DEFAULT_FPS: int = Field(default=24, ge=1, le=60)
@@ -48,39 +55,69 @@ class Settings(BaseSettings):
     # Optional features
     LOG_LEVEL: str = Field(default="INFO")
 
-    @field_validator('DEFAULT_WIDTH', 'DEFAULT_HEIGHT', 'MAX_WIDTH', 'MAX_HEIGHT')
+    # Parsed forms of comma-separated fields (filled in model_post_init)
+    _allowed_image_types: Tuple[str, ...] = PrivateAttr(default_factory=tuple)
+    _allowed_image_types_set: FrozenSet[str] = PrivateAttr(default_factory=frozenset)
+
+    @field_validator('DEFAULT_WIDTH', 'DEFAULT_HEIGHT')
     @classmethod
-    def validate_dimensions(cls, v, info):
-        """Ensure dimensions are multiples of 8 (model requirement)"""
+    def validate_default_dimensions(cls, v, info):
+        """Ensure default dimensions are multiples of 32 (model requirement)"""
+        if v % 32 != 0:
+            raise ValueError(f"{info.field_name} must be a multiple of 32, got {v}")
+        return v
+
+    @field_validator('MAX_WIDTH', 'MAX_HEIGHT')
+    @classmethod
+    def validate_max_dimensions(cls, v, info):
+        """Ensure limits are multiples of 8 (upper bounds, not generated sizes)"""
+        # Requests still need multiples of 32, so e.g. MAX_HEIGHT=1080 caps at 1056
         if v % 8 != 0:
             raise ValueError(f"{info.field_name} must be a multiple of 8, got {v}")
         return v
 
-    def get_allowed_image_types(self) -> List[str]:
-        """Get list of allowed MIME types"""
-        if isinstance(self.ALLOWED_IMAGE_TYPES, list):
-            return self.ALLOWED_IMAGE_TYPES
-        return [t.strip() for t in self.ALLOWED_IMAGE_TYPES.split(',') if t.strip()]
+    def model_post_init(self, __context: Any) -> None:
+        """Parse comma-separated fields once, after validation"""
+        self._allowed_image_types = _csv(self.ALLOWED_IMAGE_TYPES)
+        self._allowed_image_types_set = frozenset(self._allowed_image_types)
+
+    def get_allowed_image_types(self) -> Tuple[str, ...]:
+        """Get allowed MIME types"""
+        return self._allowed_image_types
+
+    def is_allowed_image_type(self, content_type: str) -> bool:
+        """Check a MIME type against the allowed set (O(1))"""
+        return content_type in self._allowed_image_types_set
+
+    # Frozen: settings never change after startup, so skip assignment validation
+    model_config = SettingsConfigDict(
+        env_file='.env',
+        env_file_encoding='utf-8',
+        case_sensitive=True,
+        extra='ignore',
+        frozen=True
+    )
 
-    class Config:
-        env_file = '.env'
-        env_file_encoding = 'utf-8'
-        case_sensitive = True
-        extra = 'ignore'
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the global settings instance, built on first use
 
-# Global settings instance
-try:
-    settings = Settings()
-except Exception as e:
-    print(f"ERROR: Failed to load settings: {e}")
-    print("Please check your .env file or environment variables")
-    raise
+    Returns:
+        Settings loaded from environment / .env
+    """
+    try:
+        return Settings()
+    except Exception as e:
+        print(f"ERROR: Failed to load settings: {e}")
+        print("Please check your .env file or environment variables")
+        raise
 
 
-# Validate configuration on import
 def validate_config():
-    """Validate critical configuration"""
+    """Validate critical configuration (warns, does not fail)"""
+    settings = get_settings()
     errors = []
 
     # Check Oracle Cloud config
@@ -97,7 +134,3 @@ def validate_config():
         print()
 
     return len(errors) == 0
-
-
-# Run validation on import (but don't fail, just warn)
-validate_config()
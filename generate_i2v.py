@@ -7,47 +7,226 @@ import torch
 import os
 import time
 import argparse
-from pathlib import Path
 from diffusers import LTXConditionPipeline
 from diffusers.pipelines.ltx.pipeline_ltx_condition import LTXVideoCondition
 from diffusers.utils import export_to_video, load_image
+from PIL import Image
 
-# Configuration
-MODEL_PATH = '/workspace/models/ltxv-13b-distilled'
-OUTPUT_DIR = '/workspace/outputs'
+# Configuration (weights are baked into the image at build time)
+MODEL_PATH = os.environ.get('MODEL_PATH', '/workspace/models/ltxv-13b-distilled')
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', '/workspace/outputs')
 
-# 720p settings
+# 720p-class settings (LTX needs width/height divisible by 32)
 WIDTH = 1280
-HEIGHT = 720
+HEIGHT = 704
 NUM_FRAMES = 121  # ~5 seconds at 24fps
 FPS = 24
 NUM_STEPS = 8  # Distilled model needs fewer steps
+NEGATIVE_PROMPT = "worst quality, inconsistent motion, blurry, jittery, distorted"
 
+# torch.compile transformer + VAE decoder (reduce-overhead = CUDA graphs).
+# Slow first call per shape, faster steady state; opt-in via LTX_TORCH_COMPILE=1
+TORCH_COMPILE = os.environ.get("LTX_TORCH_COMPILE", "0") == "1"
 
-def load_pipeline():
-    """Load LTX pipeline with optimizations"""
+# VAE decode tile size in pixels (multiple of 32): smaller saves VRAM (A40),
+# larger decodes faster (A100/H100). Unset keeps the diffusers default.
+# Parsed and checked by vae_tile_size() when the pipeline loads
+VAE_TILE_SIZE = os.environ.get("LTX_VAE_TILE_SIZE", "")
+VAE_TILE_OVERLAP = 64
+
+
+def vae_tile_size():
+    """Parse and check LTX_VAE_TILE_SIZE
+
+    Returns:
+        Tile size in pixels, or None (unset or 0) to keep the diffusers default
+
+    Raises:
+        ValueError: If the value is not a multiple of 32 above VAE_TILE_OVERLAP
+    """
+    if not VAE_TILE_SIZE.strip():
+        return None
+    try:
+        size = int(VAE_TILE_SIZE)
+    except ValueError:
+        raise ValueError(f"LTX_VAE_TILE_SIZE must be an integer, got {VAE_TILE_SIZE!r}")
+    if size == 0:
+        return None
+    if size % 32 != 0 or size <= VAE_TILE_OVERLAP:
+        raise ValueError(
+            f"LTX_VAE_TILE_SIZE must be a multiple of 32 greater than "
+            f"{VAE_TILE_OVERLAP} (the tile overlap), got {size}"
+        )
+    return size
+
+
+def load_pipeline(model_path=None, output_dir=None):
+    """Load LTX pipeline with optimizations
+
+    Args:
+        model_path: Model weights directory (defaults to MODEL_PATH)
+        output_dir: Where generated videos are written (defaults to OUTPUT_DIR);
+            kept on the pipeline for warmup_pipeline/generate_video
+    """
+    model_path = model_path or MODEL_PATH
+    output_dir = output_dir or OUTPUT_DIR
     print("Loading LTX Video 13B Distilled...")
+
+    # Deploy-time invariant: never fall back to downloading weights at runtime
+    if not os.path.isdir(model_path):
+        raise FileNotFoundError(f"Model weights not found at {model_path}")
+
+    # Check config before spending time on the weights
+    tile_size = vae_tile_size()
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # TF32 for any fp32 matmuls/convs; cuDNN autotunes the VAE's 3D convs on
+    # the first call per shape. The handler's warmup runs the default job
+    # shape, so only jobs with other shapes pay that at request time
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
     
     pipe = LTXConditionPipeline.from_pretrained(
-        MODEL_PATH,
+        model_path,
         torch_dtype=torch.bfloat16
     )
     pipe.to("cuda")
-    pipe.vae.enable_tiling()
+    pipe._output_dir = output_dir
+
+    # Tiling bounds spatial activation size; slicing decodes batch items one at a time
+    if tile_size:
+        pipe.vae.enable_tiling(
+            tile_sample_min_height=tile_size,
+            tile_sample_min_width=tile_size,
+            tile_sample_stride_height=tile_size - VAE_TILE_OVERLAP,
+            tile_sample_stride_width=tile_size - VAE_TILE_OVERLAP
+        )
+    else:
+        pipe.vae.enable_tiling()
+    pipe.vae.enable_slicing()
+
+    if TORCH_COMPILE:
+        try:
+            pipe.transformer = torch.compile(
+                pipe.transformer, mode="reduce-overhead", fullgraph=False, dynamic=False
+            )
+            pipe.vae.decoder = torch.compile(
+                pipe.vae.decoder, mode="reduce-overhead", dynamic=False
+            )
+            # Compilation itself happens lazily on the first call (the warmup),
+            # which falls back to eager via disable_compile() if it fails
+            print("torch.compile enabled (transformer, VAE decoder)")
+        except Exception as e:
+            print(f"Warning: torch.compile unavailable, running eager: {e}")
     
+    # The negative prompt never changes: run it through the text encoder once here
+    encode_negative_prompt(pipe)
+
     print("Model loaded successfully!")
     return pipe
 
 
-def generate_video(pipe, image_path, prompt, output_name, seed=42):
+def disable_compile(pipe):
+    """Swap torch.compile wrappers back for the original eager modules
+
+    Returns:
+        True if any module was compiled (and has been restored)
+    """
+    restored = False
+    if hasattr(pipe.transformer, "_orig_mod"):
+        pipe.transformer = pipe.transformer._orig_mod
+        restored = True
+    if hasattr(pipe.vae.decoder, "_orig_mod"):
+        pipe.vae.decoder = pipe.vae.decoder._orig_mod
+        restored = True
+    return restored
+
+
+def encode_negative_prompt(pipe):
+    """Encode NEGATIVE_PROMPT once per pipeline and cache it on the pipeline
+
+    Returns:
+        Tuple of (prompt_embeds, prompt_attention_mask)
+    """
+    cached = getattr(pipe, "_negative_prompt_cache", None)
+    if cached is None:
+        with torch.inference_mode():
+            embeds, mask, _, _ = pipe.encode_prompt(
+                prompt=NEGATIVE_PROMPT,
+                do_classifier_free_guidance=False,
+                device="cuda"
+            )
+        cached = (embeds, mask)
+        pipe._negative_prompt_cache = cached
+    return cached
+
+
+@torch.inference_mode()
+def warmup_pipeline(pipe, width=256, height=256, num_frames=9, num_steps=1):
+    """Run one small throwaway generation
+
+    Loads CUDA kernels, sets up cuBLAS/cuDNN workspaces and exercises the
+    text encoder, transformer, VAE and the mp4 export so the first real job
+    doesn't pay for it. With torch.compile this is the first call, so a
+    compile failure here reverts the pipeline to eager and retries once.
+    Failures are logged, not raised.
+    """
+    print(f"Warming up pipeline ({width}x{height}, {num_frames} frames)...")
+    start = time.time()
+    output_path = f"{pipe._output_dir}/__warmup__.mp4"
+
+    try:
+        condition = LTXVideoCondition(
+            image=Image.new("RGB", (width, height)),
+            frame_index=0
+        )
+        for attempt in range(2):
+            try:
+                video = pipe(
+                    conditions=[condition],
+                    prompt="warmup",
+                    width=width,
+                    height=height,
+                    num_frames=num_frames,
+                    num_inference_steps=num_steps,
+                    generator=torch.Generator(device="cuda").manual_seed(0),
+                    output_type="pil"
+                ).frames[0]
+                break
+            except torch.cuda.OutOfMemoryError:
+                raise
+            except Exception as e:
+                if attempt or not disable_compile(pipe):
+                    raise
+                print(f"Warning: torch.compile failed, falling back to eager: {e}")
+        export_to_video(video, output_path, fps=FPS)
+    except Exception as e:
+        print(f"Warning: warmup failed: {e}")
+        return
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    print(f"Warmup done in {time.time() - start:.1f}s")
+
+
+@torch.inference_mode()
+def generate_video(pipe, image_path, prompt, output_name, seed=42,
+                   width=None, height=None, num_frames=None, num_steps=None):
     """Generate video from image
 
     Args:
         pipe: Loaded LTX pipeline
-        image_path: Path to input image (local path or URL)
+        image_path: Input image (local path, URL or PIL image)
         prompt: Motion description prompt
         output_name: Output filename (without extension)
         seed: Random seed for reproducibility
+        width: Output width (defaults to WIDTH)
+        height: Output height (defaults to HEIGHT)
+        num_frames: Number of frames (defaults to NUM_FRAMES)
+        num_steps: Inference steps (defaults to NUM_STEPS)
 
     Returns:
         Path to generated video
@@ -56,13 +235,18 @@ def generate_video(pipe, image_path, prompt, output_name, seed=42):
         ValueError: If image_path is invalid or inaccessible
         Exception: If generation fails
     """
+    width = width or WIDTH
+    height = height or HEIGHT
+    num_frames = num_frames or NUM_FRAMES
+    num_steps = num_steps or NUM_STEPS
+
     # Validate and load input image
     # Note: URL validation should be done by caller (validation.py)
     # This is a secondary safety check
     try:
         image = load_image(image_path)
     except Exception as e:
-        raise ValueError(f"Failed to load image from {image_path[:50]}...: {e}")
+        raise ValueError(f"Failed to load image from {str(image_path)[:50]}...: {e}")
     
     # Create conditioning
     condition = LTXVideoCondition(
@@ -70,42 +254,50 @@ def generate_video(pipe, image_path, prompt, output_name, seed=42):
         frame_index=0
     )
     
-    negative_prompt = "worst quality, inconsistent motion, blurry, jittery, distorted"
-    
+    negative_embeds, negative_mask = encode_negative_prompt(pipe)
+
     print(f"Generating video: {output_name}")
-    print(f"  Resolution: {WIDTH}x{HEIGHT}")
-    print(f"  Frames: {NUM_FRAMES} (~{NUM_FRAMES/FPS:.1f}s at {FPS}fps)")
+    print(f"  Resolution: {width}x{height}")
+    print(f"  Frames: {num_frames} (~{num_frames/FPS:.1f}s at {FPS}fps)")
     print(f"  Prompt: {prompt[:50]}...")
 
     start = time.time()
+    out_of_memory = False
 
     try:
         video = pipe(
             conditions=[condition],
             prompt=prompt,
-            negative_prompt=negative_prompt,
-            width=WIDTH,
-            height=HEIGHT,
-            num_frames=NUM_FRAMES,
-            num_inference_steps=NUM_STEPS,
-            generator=torch.Generator().manual_seed(seed),
+            negative_prompt_embeds=negative_embeds,
+            negative_prompt_attention_mask=negative_mask,
+            width=width,
+            height=height,
+            num_frames=num_frames,
+            num_inference_steps=num_steps,
+            generator=torch.Generator(device="cuda").manual_seed(seed),
             output_type="pil"
         ).frames[0]
     except torch.cuda.OutOfMemoryError:
-        raise Exception(
-            f"GPU out of memory. Try reducing resolution or num_frames. "
-            f"Current: {WIDTH}x{HEIGHT}, {NUM_FRAMES} frames"
-        )
+        # Handled below: the live exception's traceback still pins the
+        # pipeline frames (latents, activations) until this block exits
+        out_of_memory = True
     except Exception as e:
         raise Exception(f"Video generation failed: {e}")
 
+    if out_of_memory:
+        # Hand cached blocks back so the next job starts from a clean pool
+        torch.cuda.empty_cache()
+        raise Exception(
+            f"GPU out of memory. Try reducing resolution or num_frames. "
+            f"Current: {width}x{height}, {num_frames} frames"
+        ) from None
+
     elapsed = time.time() - start
     print(f"Generated in {elapsed:.1f}s")
 
-    # Save output
+    # Save output (the output dir is created once in load_pipeline)
     try:
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        output_path = f"{OUTPUT_DIR}/{output_name}.mp4"
+        output_path = f"{pipe._output_dir}/{output_name}.mp4"
         export_to_video(video, output_path, fps=FPS)
     except Exception as e:
         raise Exception(f"Failed to save video: {e}")
@@ -121,21 +313,23 @@ def main():
     parser.add_argument("--output", default="output", help="Output filename (no extension)")
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
     parser.add_argument("--width", type=int, default=1280, help="Output width")
-    parser.add_argument("--height", type=int, default=720, help="Output height")
+    parser.add_argument("--height", type=int, default=704, help="Output height")
     parser.add_argument("--frames", type=int, default=121, help="Number of frames")
     parser.add_argument("--steps", type=int, default=8, help="Inference steps")
     args = parser.parse_args()
     
-    # Update globals if custom values provided
-    global WIDTH, HEIGHT, NUM_FRAMES, NUM_STEPS
-    WIDTH = args.width
-    HEIGHT = args.height
-    NUM_FRAMES = args.frames
-    NUM_STEPS = args.steps
-    
     # Load and generate
     pipe = load_pipeline()
-    path = generate_video(pipe, args.image, args.prompt, args.output, args.seed)
+    if TORCH_COMPILE:
+        # Compile (or fall back to eager) before the real run
+        warmup_pipeline(pipe, width=args.width, height=args.height, num_frames=args.frames)
+    path = generate_video(
+        pipe, args.image, args.prompt, args.output, args.seed,
+        width=args.width,
+        height=args.height,
+        num_frames=args.frames,
+        num_steps=args.steps
+    )
     
     print(f"\nDone! Video saved to: {path}")
 
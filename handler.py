@@ -4,54 +4,232 @@ Entry point for LTX Video I2V generation on RunPod
 Async with status polling (no webhooks, no database in handler)
 """
 
-import runpod
 import os
+
+# CUDA allocator config must be set before torch is first imported (via
+# generate_i2v). Expandable segments avoid fragmentation OOMs as job
+# resolutions and frame counts vary between requests.
+os.environ.setdefault(
+    "PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:512"
+)
+# Load CUDA kernels on first use instead of all at context creation
+os.environ.setdefault("CUDA_MODULE_LOADING", "LAZY")
+# Reuse compiled inductor graphs across restarts (only matters with LTX_TORCH_COMPILE=1)
+os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+
+# With a network volume attached, keep JIT caches on it so every new worker
+# starts from kernels an earlier worker already compiled
+JIT_CACHE_DIR = "/runpod-volume/.cache/ltx-jit"
+if os.path.isdir("/runpod-volume"):
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", f"{JIT_CACHE_DIR}/inductor")
+    os.environ.setdefault("TRITON_CACHE_DIR", f"{JIT_CACHE_DIR}/triton")
+
+import runpod
+import sys
 import time
+import atexit
 import asyncio
-from datetime import datetime
-from typing import Dict, Any
-
-from generate_i2v import load_pipeline, generate_video
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import httpx
+from PIL import Image, ImageOps
+
+from generate_i2v import load_pipeline, warmup_pipeline, generate_video
 from storage import OracleObjectStorage
-from validation import validate_generation_params
+from validation import (
+    ValidationError, validate_generation_params, validate_static_params, validate_url_scheme
+)
 from utils import sanitize_error_message, format_duration
-from config import settings
+from config import get_settings, validate_config
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("handler")
+
+_BAR = "=" * 60
 
 # ==========================================
 # Global Services (loaded once on cold start)
 # ==========================================
 pipe = None
 storage = None
+http_client = None
+
+# One event loop for the life of the worker, on a background thread.
+# handler() submits each job to it, so the loop and the HTTP connection
+# pool survive between jobs instead of being rebuilt per request
+event_loop = asyncio.new_event_loop()
+threading.Thread(target=event_loop.run_forever, name="event-loop", daemon=True).start()
+atexit.register(event_loop.call_soon_threadsafe, event_loop.stop)
+
+# Single thread that owns all GPU work, so the blocking pipeline call
+# never runs on (and stalls) the event loop
+gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gpu")
+
+# Blocking per-job CPU work (validation, image decode) kept off the event loop
+cpu_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cpu")
+
+# Decoded input images keyed by content digest, so repeated jobs on the
+# same image (retries, prompt variations) skip the decode
+IMAGE_CACHE_SIZE = 8
+image_cache: "OrderedDict[str, Image.Image]" = OrderedDict()
+image_cache_lock = threading.Lock()
+
+# Fail fast on unreachable hosts; allow slower transfers once connected
+IMAGE_FETCH_TIMEOUT = httpx.Timeout(30.0, connect=3.0)
+
+# Keep idle connections to image hosts around between jobs
+IMAGE_FETCH_LIMITS = httpx.Limits(max_connections=16, keepalive_expiry=60.0)
+
+
+def load_warm_pipeline():
+    """Load the LTX pipeline and run the warmup generation"""
+    settings = get_settings()
+    start = time.time()
+    # Same paths the startup banner logs (settings also read .env)
+    loaded = load_pipeline(model_path=settings.MODEL_PATH, output_dir=settings.OUTPUT_DIR)
+    # Warm up at the default job shape (width, height and frame count) so
+    # cuDNN autotuning and, with torch.compile, graph capture are done for
+    # jobs that use the defaults. Step count doesn't change shapes: 1 is enough
+    warmup_pipeline(
+        loaded,
+        width=settings.DEFAULT_WIDTH,
+        height=settings.DEFAULT_HEIGHT,
+        num_frames=settings.DEFAULT_NUM_FRAMES,
+        num_steps=1
+    )
+    elapsed = time.time() - start
+    logger.info("Pipeline loaded and warmed up in %s", format_duration(elapsed))
+    return loaded
 
 
 def init_services():
     """
     Initialize services on cold start
-    This runs once when the worker starts
+    This runs once when the worker starts, before it accepts jobs
     """
-    global pipe, storage
+    global pipe, storage, http_client
 
-    print("=" * 60)
-    print("🚀 Initializing LTX Video I2V Handler")
-    print("=" * 60)
+    logger.info(_BAR)
+    logger.info("Initializing LTX Video I2V Handler")
+    logger.info(_BAR)
 
-    # Load model pipeline
+    # Load the pipeline (on the GPU thread) and set up storage concurrently
+    pipe_future = storage_future = None
     if pipe is None:
-        print("\n[1/2] Loading LTX Video pipeline...")
-        start = time.time()
-        pipe = load_pipeline()
-        elapsed = time.time() - start
-        print(f"✓ Pipeline loaded in {format_duration(elapsed)}")
-
-    # Initialize Oracle Object Storage
+        logger.info("[1/2] Loading LTX Video pipeline...")
+        pipe_future = gpu_executor.submit(load_warm_pipeline)
     if storage is None:
-        print("\n[2/2] Initializing Oracle Object Storage...")
-        storage = OracleObjectStorage()
-        print(f"✓ Storage ready (bucket: {storage.bucket_name})")
+        logger.info("[2/2] Initializing Oracle Object Storage...")
+        storage_future = cpu_executor.submit(OracleObjectStorage)
+
+    if storage_future is not None:
+        storage = storage_future.result()
+        logger.info("Storage ready (bucket: %s)", storage.bucket_name)
+    if pipe_future is not None:
+        pipe = pipe_future.result()
+
+    # Shared HTTP client for input image downloads (keeps connections alive)
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=IMAGE_FETCH_TIMEOUT, limits=IMAGE_FETCH_LIMITS
+        )
 
-    print("\n" + "=" * 60)
-    print("✅ Handler initialization complete")
-    print("=" * 60 + "\n")
+    logger.info(_BAR)
+    logger.info("Handler initialization complete")
+    logger.info(_BAR)
+
+
+@contextmanager
+def stage(name: str, job_id: str):
+    """
+    Time one step of a job and log it as a single line
+
+    Yields a dict whose "seconds" key holds the elapsed time once the block exits
+    """
+    timing = {}
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["seconds"] = time.perf_counter() - start
+        logger.info("job=%s stage=%s took=%.2fs", job_id, name, timing["seconds"])
+
+
+def decode_image(data: bytes) -> Image.Image:
+    """
+    Decode image bytes to RGB, reusing a cached decode of identical content
+
+    Args:
+        data: Raw image file bytes
+
+    Returns:
+        RGB PIL image
+    """
+    key = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    with image_cache_lock:
+        image = image_cache.get(key)
+        if image is not None:
+            image_cache.move_to_end(key)
+            return image
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert("RGB")
+
+    with image_cache_lock:
+        image_cache[key] = image
+        if len(image_cache) > IMAGE_CACHE_SIZE:
+            image_cache.popitem(last=False)
+
+    return image
+
+
+async def fetch_image(url: str) -> Image.Image:
+    """
+    Download and decode the input image without blocking the event loop
+
+    Args:
+        url: Image URL (already validated against SSRF)
+
+    Returns:
+        RGB PIL image
+
+    Raises:
+        ValueError: If the download fails or the image is too large
+    """
+    settings = get_settings()
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    too_large = f"Image too large. Max size: {settings.MAX_FILE_SIZE_MB}MB"
+
+    # Stream the body so an oversized image is rejected before it is buffered
+    chunks = []
+    received = 0
+    try:
+        async with http_client.stream("GET", url) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length", "")
+            if content_length.isdigit() and int(content_length) > max_bytes:
+                raise ValueError(too_large)
+
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ValueError(too_large)
+                chunks.append(chunk)
+    except httpx.HTTPError as e:
+        raise ValueError(f"Failed to download image: {e}")
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, decode_image, b"".join(chunks))
 
 
 async def process_job(job_input: Dict[str, Any]) -> Dict[str, Any]:
@@ -65,7 +243,7 @@ async def process_job(job_input: Dict[str, Any]) -> Dict[str, Any]:
         "prompt": "motion description",
         "seed": 42,
         "width": 1280,
-        "height": 720,
+        "height": 704,
         "num_frames": 121
     }
 
@@ -79,97 +257,91 @@ async def process_job(job_input: Dict[str, Any]) -> Dict[str, Any]:
     }
     """
 
-    # Initialize services if not already done
-    init_services()
+    assert pipe is not None and storage is not None, "init_services() must run first"
 
     # Extract parameters
     job_id = job_input.get('job_id')
 
-    print(f"\n{'='*60}")
-    print(f"🔹 Processing job: {job_id}")
-    print(f"{'='*60}")
+    logger.info("job=%s started", job_id)
 
-    try:
-        # Validate all input parameters
-        print("\n[1/4] Validating parameters...")
-        validated = validate_generation_params(
-            image_url=job_input.get('image_url'),
-            prompt=job_input.get('prompt'),
-            width=job_input.get('width'),
-            height=job_input.get('height'),
-            num_frames=job_input.get('num_frames'),
-            num_steps=job_input.get('num_steps'),
-            seed=job_input.get('seed'),
-            webhook_url=None  # Not used in simplified version
-        )
-        print(f"✓ Parameters validated")
-        print(f"  - Image: {validated['image_url'][:50]}...")
-        print(f"  - Prompt: {validated['prompt'][:50]}...")
-        print(f"  - Resolution: {validated['width']}x{validated['height']}")
-        print(f"  - Frames: {validated['num_frames']}")
-
-        # Generate video
-        print("\n[2/4] Generating video...")
-        print(f"⏱️  Starting generation at {datetime.utcnow().strftime('%H:%M:%S')}")
+    loop = asyncio.get_running_loop()
+    video_path = None
 
+    try:
+        # Validate all input parameters (off the event loop: URL checks do DNS lookups)
+        with stage("validate", job_id):
+            validated = await loop.run_in_executor(
+                cpu_executor,
+                partial(
+                    validate_generation_params,
+                    image_url=job_input.get('image_url'),
+                    prompt=job_input.get('prompt'),
+                    width=job_input.get('width'),
+                    height=job_input.get('height'),
+                    num_frames=job_input.get('num_frames'),
+                    num_steps=job_input.get('num_steps'),
+                    seed=job_input.get('seed'),
+                    webhook_url=None  # Not used in simplified version
+                )
+            )
+
+        # Timed from here so the total covers the image download, as it did
+        # when the pipeline fetched the URL itself
         start_time = time.time()
 
-        video_path = generate_video(
-            pipe=pipe,
-            image_path=validated['image_url'],
-            prompt=validated['prompt'],
-            output_name=job_id,
-            seed=validated['seed']
-        )
-
-        generation_time = time.time() - start_time
+        # Fetch the input image here so network I/O stays off the GPU thread
+        with stage("fetch_image", job_id):
+            image = await fetch_image(validated['image_url'])
 
-        print(f"✓ Video generated in {format_duration(generation_time)}")
-        print(f"  - Local path: {video_path}")
+        # Generate video
+        with stage("generate", job_id) as generation:
+            video_path = await loop.run_in_executor(
+                gpu_executor,
+                partial(
+                    generate_video,
+                    pipe=pipe,
+                    image_path=image,
+                    prompt=validated['prompt'],
+                    output_name=job_id,
+                    seed=validated['seed'],
+                    width=validated['width'],
+                    height=validated['height'],
+                    num_frames=validated['num_frames'],
+                    num_steps=validated['num_steps']
+                )
+            )
 
         # Upload to Oracle Cloud Storage
-        print("\n[3/4] Uploading to Oracle Cloud Storage...")
-        upload_start = time.time()
-
-        object_name, signed_url = await storage.upload_video(
-            file_path=video_path,
-            job_id=job_id
-        )
-
-        upload_time = time.time() - upload_start
-        print(f"✓ Upload complete in {format_duration(upload_time)}")
-        print(f"  - Object: {object_name}")
-        print(f"  - URL: {signed_url[:60]}...")
-
-        # Clean up local file
-        print("\n[4/4] Cleaning up...")
-        if os.path.exists(video_path):
-            os.remove(video_path)
-            print("✓ Local file cleaned up")
+        with stage("upload", job_id) as upload:
+            object_name, signed_url = await storage.upload_video(
+                file_path=video_path,
+                job_id=job_id
+            )
 
         # Success response
         total_time = time.time() - start_time
-        print(f"\n{'='*60}")
-        print(f"✅ Job completed successfully!")
-        print(f"⏱️  Total time: {format_duration(total_time)}")
-        print(f"{'='*60}\n")
+        logger.info(
+            "job=%s completed %dx%d frames=%d total=%s",
+            job_id, validated['width'], validated['height'],
+            validated['num_frames'], format_duration(total_time)
+        )
 
         return {
             "status": "completed",
             "job_id": job_id,
             "video_url": signed_url,
             "object_name": object_name,
-            "generation_time_seconds": round(generation_time, 2),
-            "upload_time_seconds": round(upload_time, 2),
+            "generation_time_seconds": round(generation["seconds"], 2),
+            "upload_time_seconds": round(upload["seconds"], 2),
             "total_time_seconds": round(total_time, 2)
         }
 
     except Exception as e:
         # Handle errors
         error_message = sanitize_error_message(e, include_type=True)
-        print(f"\n{'='*60}")
-        print(f"❌ Job failed: {error_message}")
-        print(f"{'='*60}\n")
+        logger.error("job=%s failed: %s", job_id, error_message)
+        # Full traceback only when LOG_LEVEL=DEBUG (CUDA errors can be many KB)
+        logger.debug("job=%s traceback", job_id, exc_info=True)
 
         # Return error response
         return {
@@ -178,6 +350,40 @@ async def process_job(job_input: Dict[str, Any]) -> Dict[str, Any]:
             "error": error_message
         }
 
+    finally:
+        # Remove the local video (also after a failed upload); single unlink, off the loop
+        if video_path:
+            await loop.run_in_executor(
+                cpu_executor, partial(Path(video_path).unlink, missing_ok=True)
+            )
+
+
+def precheck_job(job_input: Dict[str, Any]) -> Optional[str]:
+    """
+    Cheap checks on the job input, run before it is queued
+
+    Runs the validators that need no network access (URL scheme, prompt,
+    dimensions, frames, steps, seed), so bad shapes fail in milliseconds.
+    The full validation, including the SSRF DNS checks, still runs in process_job.
+
+    Returns:
+        Error message, or None if the input passed these checks
+    """
+    try:
+        validate_url_scheme(job_input['image_url'])
+        validate_static_params(
+            job_input.get('prompt'),
+            job_input.get('width'),
+            job_input.get('height'),
+            job_input.get('num_frames'),
+            job_input.get('num_steps'),
+            job_input.get('seed')
+        )
+    except ValidationError as e:
+        return e.detail
+
+    return None
+
 
 def handler(event: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -206,28 +412,47 @@ def handler(event: Dict[str, Any]) -> Dict[str, Any]:
             "error": "Missing required fields: image_url and/or prompt"
         }
 
-    # Run async process_job in event loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    error = precheck_job(job_input)
+    if error:
+        return {
+            "status": "failed",
+            "job_id": job_input['job_id'],
+            "error": error
+        }
 
-    try:
-        result = loop.run_until_complete(process_job(job_input))
-        return result
-    finally:
-        loop.close()
+    # Run async process_job on the persistent event loop
+    future = asyncio.run_coroutine_threadsafe(process_job(job_input), event_loop)
+    return future.result()
 
 
 # ==========================================
 # RunPod Serverless Start
 # ==========================================
 if __name__ == "__main__":
-    print("\n" + "=" * 60)
-    print("🚀 Starting RunPod Serverless Handler")
-    print("=" * 60)
-    print(f"Model Path: {settings.MODEL_PATH}")
-    print(f"Output Dir: {settings.OUTPUT_DIR}")
-    print(f"OCI Bucket: {settings.OCI_BUCKET_NAME}")
-    print("=" * 60 + "\n")
+    settings = get_settings()
+    logging.getLogger().setLevel(settings.LOG_LEVEL.upper())
+    validate_config()
+
+    logger.info(_BAR)
+    logger.info("Starting RunPod Serverless Handler")
+    logger.info(_BAR)
+    logger.info("Model Path: %s", settings.MODEL_PATH)
+    logger.info("Output Dir: %s", settings.OUTPUT_DIR)
+    logger.info("OCI Bucket: %s", settings.OCI_BUCKET_NAME)
+    logger.info(_BAR)
+
+    # Load everything before RunPod starts routing jobs to this worker.
+    # A worker that can't load must exit so the orchestrator replaces it.
+    # os._exit: sys.exit would wait for the gpu/cpu executor threads, e.g.
+    # a pipeline load still running after storage init failed
+    try:
+        init_services()
+    except Exception:
+        logger.exception("Worker initialization failed")
+        logging.shutdown()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)
 
     # Start RunPod serverless
     runpod.serverless.start({"handler": handler})
@@ -4,11 +4,12 @@ Upload videos and generate pre-authenticated signed URLs
 """
 
 import oci
-from oci.object_storage import ObjectStorageClient
+import asyncio
+from oci.object_storage import UploadManager
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Tuple
-from config import settings
+from config import get_settings
 
 
 class StorageError(Exception):
@@ -16,11 +17,19 @@ class StorageError(Exception):
     pass
 
 
+# Files above this size go up as parallel multipart uploads
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_PARALLELISM = 4
+
+
 class OracleObjectStorage:
     """Oracle Cloud Object Storage client"""
 
     def __init__(self):
         """Initialize OCI client with credentials from config"""
+        settings = get_settings()
+
         try:
             # Use the working configuration (same as your "Signer OK" test)
             self.config = {
@@ -34,6 +43,12 @@ class OracleObjectStorage:
             # Do NOT use key_content. Do NOT manually load PEM.
             # Let the OCI SDK read the file itself.
             self.client = oci.object_storage.ObjectStorageClient(self.config)
+            self.upload_manager = UploadManager(
+                self.client,
+                allow_multipart_uploads=True,
+                allow_parallel_uploads=True,
+                parallel_process_count=MULTIPART_PARALLELISM
+            )
 
             self.namespace = settings.OCI_NAMESPACE
             self.bucket = settings.OCI_BUCKET_NAME
@@ -66,7 +81,8 @@ class OracleObjectStorage:
             StorageError: If upload fails
         """
         # Validate file exists
-        if not Path(file_path).exists():
+        path = Path(file_path)
+        if not path.exists():
             raise StorageError(f"File not found: {file_path}")
 
         # Build object name (organize by date for easier management)
@@ -77,20 +93,17 @@ class OracleObjectStorage:
         try:
             print(f"Uploading video to OCI: {object_name}")
 
-            # Upload file with streaming
-            with open(file_path, 'rb') as f:
-                self.client.put_object(
-                    namespace_name=self.namespace,
-                    bucket_name=self.bucket_name,
-                    object_name=object_name,
-                    put_object_body=f,
-                    content_type=content_type,
-                    # Optional metadata
-                    metadata={
-                        'job_id': job_id,
-                        'uploaded_at': now.isoformat()
-                    }
-                )
+            # Optional metadata
+            metadata = {
+                'job_id': job_id,
+                'uploaded_at': now.isoformat()
+            }
+
+            # The SDK is blocking: run it in a thread so the event loop stays free
+            await asyncio.to_thread(
+                self._upload_file, file_path, path.stat().st_size,
+                object_name, content_type, metadata
+            )
 
             print(f"✓ Upload complete: {object_name}")
 
@@ -102,6 +115,38 @@ class OracleObjectStorage:
         except Exception as e:
             raise StorageError(f"Failed to upload video: {e}")
 
+    def _upload_file(
+        self,
+        file_path: str,
+        file_size: int,
+        object_name: str,
+        content_type: str,
+        metadata: dict
+    ) -> None:
+        """Upload a file: single PUT when small, parallel multipart when large"""
+        if file_size > MULTIPART_THRESHOLD:
+            self.upload_manager.upload_file(
+                self.namespace,
+                self.bucket_name,
+                object_name,
+                file_path,
+                part_size=MULTIPART_PART_SIZE,
+                content_type=content_type,
+                metadata=metadata
+            )
+            return
+
+        # Upload file with streaming
+        with open(file_path, 'rb') as f:
+            self.client.put_object(
+                namespace_name=self.namespace,
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                put_object_body=f,
+                content_type=content_type,
+                opc_meta=metadata
+            )
+
     async def create_signed_url(
         self,
         object_name: str,
@@ -121,11 +166,12 @@ class OracleObjectStorage:
             StorageError: If PAR creation fails
         """
         try:
-            # Calculate expiration time
-            expiration = datetime.utcnow() + timedelta(days=expiration_days)
+            # Calculate expiration time (one clock read for both expiry and name)
+            now = datetime.utcnow()
+            expiration = now + timedelta(days=expiration_days)
 
             # Create PAR details
-            par_name = f"par-{object_name.replace('/', '-')}-{int(datetime.utcnow().timestamp())}"
+            par_name = f"par-{object_name.replace('/', '-')}-{int(now.timestamp())}"
 
             create_par_details = oci.object_storage.models.CreatePreauthenticatedRequestDetails(
                 name=par_name,
@@ -284,14 +330,8 @@ class OracleObjectStorage:
         }
 
 
-# Global storage instance
-storage = OracleObjectStorage()
-
-
 if __name__ == "__main__":
     # Test storage connection
-    import asyncio
-
     async def test():
         print("Testing Oracle Object Storage...")
 
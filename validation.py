@@ -11,7 +11,7 @@ from urllib.parse import urlparse
 from typing import Tuple
 from fastapi import UploadFile, HTTPException, status
 import bleach
-from config import settings
+from config import get_settings
 
 
 class ValidationError(HTTPException):
@@ -56,6 +56,31 @@ def is_private_ip(ip_str: str) -> bool:
         return False
 
 
+def validate_url_scheme(url: str):
+    """
+    Parse a URL and check its scheme (no network access)
+
+    Args:
+        url: URL to check
+
+    Returns:
+        Parsed URL
+
+    Raises:
+        ValidationError: If the URL can't be parsed or isn't http/https
+    """
+    try:
+        parsed = urlparse(url)
+    except Exception:
+        raise ValidationError("Invalid URL format")
+
+    # Scheme validation (only http/https)
+    if parsed.scheme not in ['http', 'https']:
+        raise ValidationError(f"Invalid URL scheme: {parsed.scheme}. Only http/https allowed")
+
+    return parsed
+
+
 def validate_image_url(url: str) -> str:
     """
     Validate image URL to prevent SSRF attacks
@@ -76,15 +101,7 @@ def validate_image_url(url: str) -> str:
     if len(url) > 2000:
         raise ValidationError("Image URL too long (max 2000 characters)")
 
-    # Parse URL
-    try:
-        parsed = urlparse(url)
-    except Exception:
-        raise ValidationError("Invalid URL format")
-
-    # Scheme validation (only http/https)
-    if parsed.scheme not in ['http', 'https']:
-        raise ValidationError(f"Invalid URL scheme: {parsed.scheme}. Only http/https allowed")
+    parsed = validate_url_scheme(url)
 
     # Must have a hostname
     if not parsed.hostname:
@@ -197,6 +214,8 @@ def validate_dimensions(width: int, height: int) -> Tuple[int, int]:
     if not isinstance(width, int) or not isinstance(height, int):
         raise ValidationError("Width and height must be integers")
 
+    settings = get_settings()
+
     # Range validation
     if width < 256 or width > settings.MAX_WIDTH:
         raise ValidationError(
@@ -208,12 +227,12 @@ def validate_dimensions(width: int, height: int) -> Tuple[int, int]:
             f"Height must be between 256 and {settings.MAX_HEIGHT}, got {height}"
         )
 
-    # Must be multiples of 8 (model requirement)
-    if width % 8 != 0:
-        raise ValidationError(f"Width must be a multiple of 8, got {width}")
+    # Must be multiples of 32 (model requirement)
+    if width % 32 != 0:
+        raise ValidationError(f"Width must be a multiple of 32, got {width}")
 
-    if height % 8 != 0:
-        raise ValidationError(f"Height must be a multiple of 8, got {height}")
+    if height % 32 != 0:
+        raise ValidationError(f"Height must be a multiple of 32, got {height}")
 
     # Aspect ratio validation (optional, prevent extreme ratios)
     aspect_ratio = width / height
@@ -242,15 +261,16 @@ def validate_num_frames(num_frames: int) -> int:
     if not isinstance(num_frames, int):
         raise ValidationError("num_frames must be an integer")
 
+    settings = get_settings()
     if num_frames < 25 or num_frames > settings.MAX_FRAMES:
         raise ValidationError(
             f"num_frames must be between 25 and {settings.MAX_FRAMES}, "
             f"got {num_frames}"
         )
 
-    # Must be odd for best results with the model
-    if num_frames % 2 == 0:
-        raise ValidationError(f"num_frames should be odd, got {num_frames}")
+    # The VAE compresses time 8x: frame counts must be 8k+1
+    if num_frames % 8 != 1:
+        raise ValidationError(f"num_frames must be 8k+1 (e.g. 97, 121), got {num_frames}")
 
     return num_frames
 
@@ -294,6 +314,7 @@ def validate_num_steps(num_steps: int) -> int:
     if not isinstance(num_steps, int):
         raise ValidationError("num_steps must be an integer")
 
+    settings = get_settings()
     if num_steps < 1 or num_steps > settings.MAX_STEPS:
         raise ValidationError(
             f"num_steps must be between 1 and {settings.MAX_STEPS}, "
@@ -320,6 +341,8 @@ async def validate_file_upload(file: UploadFile) -> bool:
     if not file.filename:
         raise ValidationError("No filename provided")
 
+    settings = get_settings()
+
     # File size check (read in chunks to avoid memory issues)
     max_size_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
     total_size = 0
@@ -344,12 +367,11 @@ async def validate_file_upload(file: UploadFile) -> bool:
 
     # MIME type check
     content_type = file.content_type
-    allowed_types = settings.get_allowed_image_types()
 
-    if content_type not in allowed_types:
+    if not settings.is_allowed_image_type(content_type):
         raise ValidationError(
             f"Invalid file type: {content_type}. "
-            f"Allowed: {', '.join(allowed_types)}"
+            f"Allowed: {', '.join(settings.get_allowed_image_types())}"
         )
 
     # Read first bytes to check magic number
@@ -453,6 +475,27 @@ def validate_generation_params(
     Returns:
         Dictionary of validated parameters with defaults applied
     """
+    params = validate_static_params(prompt, width, height, num_frames, num_steps, seed)
+    validated = {'image_url': validate_image_url(image_url), **params}
+
+    # Optional webhook URL
+    if webhook_url:
+        validated['webhook_url'] = validate_webhook_url(webhook_url)
+    else:
+        validated['webhook_url'] = None
+
+    return validated
+
+
+def validate_static_params(prompt, width, height, num_frames, num_steps, seed) -> dict:
+    """
+    Validate the non-URL parameters, applying defaults (no network or DNS lookups)
+
+    Returns:
+        Dictionary of validated prompt, width, height, num_frames, num_steps, seed
+    """
+    settings = get_settings()
+
     # Apply defaults
     width = width if width is not None else settings.DEFAULT_WIDTH
     height = height if height is not None else settings.DEFAULT_HEIGHT
@@ -460,21 +503,13 @@ def validate_generation_params(
     num_steps = num_steps if num_steps is not None else settings.DEFAULT_NUM_STEPS
     seed = seed if seed is not None else 42
 
-    # Validate each parameter
-    validated = {
-        'image_url': validate_image_url(image_url),
+    # Validate each parameter (dimensions are checked together, once)
+    width, height = validate_dimensions(width, height)
+    return {
         'prompt': validate_prompt(prompt),
-        'width': validate_dimensions(width, height)[0],
-        'height': validate_dimensions(width, height)[1],
+        'width': width,
+        'height': height,
         'num_frames': validate_num_frames(num_frames),
         'num_steps': validate_num_steps(num_steps),
         'seed': validate_seed(seed),
     }
-
-    # Optional webhook URL
-    if webhook_url:
-        validated['webhook_url'] = validate_webhook_url(webhook_url)
-    else:
-        validated['webhook_url'] = None
-
-    return validated